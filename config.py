@@ -9,6 +9,9 @@ class Config:
     
     # YOLO Model Configuration
     MODEL_NAME = os.getenv('MODEL_NAME', 'yolov8m.pt')  # yolov8m = medium model
+    # fp16/int8 export .pt models to a TensorRT engine when CUDA is available
+    MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'fp32').lower()  # fp32, fp16 or int8
+    INT8_CALIBRATION_DATA = os.getenv('INT8_CALIBRATION_DATA', 'coco8.yaml')  # Dataset YAML for int8 calibration
     
     # Video Source Configuration
     # Can be:
@@ -20,6 +23,7 @@ class Config:
     
     # Frame Processing Configuration
     FRAME_SKIP = int(os.getenv('FRAME_SKIP', '1'))  # Process every Nth frame (1 = all frames)
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', '1'))  # Frames per YOLO forward pass (>1 mainly helps on GPU)
     
     # Detection Configuration
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', '0.5'))
@@ -31,6 +35,7 @@ class Config:
     
     # Display Configuration
     DISPLAY_VIDEO = os.getenv('DISPLAY_VIDEO', 'False').lower() == 'true'
+    DISPLAY_INTERVAL = float(os.getenv('DISPLAY_INTERVAL', '0.1'))  # Min seconds between terminal updates
     
     # Output Configuration
     SAVE_OUTPUT = os.getenv('SAVE_OUTPUT', 'False').lower() == 'true'
@@ -41,14 +46,25 @@ class Config:
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
     MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'yolo_detections')
     MONGO_COLLECTION_NAME = os.getenv('MONGO_COLLECTION_NAME', 'detections')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '10'))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000'))
+    MONGO_BATCH_SIZE = int(os.getenv('MONGO_BATCH_SIZE', '50'))  # Documents buffered per insert_many
+    MONGO_QUEUE_SIZE = int(os.getenv('MONGO_QUEUE_SIZE', '1000'))  # Pending documents before dropping
+    UNACK_WRITES = os.getenv('UNACK_WRITES', 'True').lower() == 'true'  # w=0 for detection inserts
+    # Detections expire after N days via a TTL index (0 = keep until cleaned up manually).
+    # Once the index exists, retention changes made with cleanup_old_data take priority.
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '0'))
     
     @classmethod
     def display_config(cls):
         """Display current configuration"""
         print("\nCurrent Configuration:")
         print(f"  Model: {cls.MODEL_NAME}")
+        print(f"  Precision: {cls.MODEL_PRECISION}")
         print(f"  Video Source: {cls.VIDEO_SOURCE}")
         print(f"  Frame Skip: {cls.FRAME_SKIP}")
+        print(f"  Batch Size: {cls.BATCH_SIZE}")
         print(f"  Confidence: {cls.CONFIDENCE_THRESHOLD}")
         print(f"  Target Classes: {cls.TARGET_CLASSES if cls.TARGET_CLASSES else 'All classes'}")
         print(f"  Display Video: {cls.DISPLAY_VIDEO}")
@@ -1,33 +1,67 @@
+from functools import lru_cache
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.write_concern import WriteConcern
 from config import Config
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+TTL_INDEX_NAME = "ts_ttl"
+
+# Single-field indexes made redundant by the compound index
+OBSOLETE_INDEXES = ("video_source_1", "frame_number_1")
+
+# The detections array holds every bounding box and dominates document size
+DEFAULT_PROJECTION = {"detections": 0}
+
+
+@lru_cache(maxsize=None)
+def _get_client():
+    """Return the process-wide MongoClient, creating its connection pool on first use"""
+    client = MongoClient(
+        Config.MONGO_URI,
+        serverSelectionTimeoutMS=5000,  # 5 second timeout
+        maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+        minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS
+    )
+    
+    # Test connection (a failure raises, so nothing is cached)
+    try:
+        client.admin.command('ping')
+    except Exception:
+        client.close()
+        raise
+    return client
+
 
 class MongoDB:
     """MongoDB handler for storing detection results"""
     
     def __init__(self):
-        self.config = Config()
         self.client = None
         self.db = None
         self.collection = None
+        self.write_collection = None
         self._connect()
     
     def _connect(self):
         """Establish connection to MongoDB"""
         try:
-            # Create MongoDB client
-            self.client = MongoClient(
-                self.config.MONGO_URI,
-                serverSelectionTimeoutMS=5000  # 5 second timeout
-            )
-            
-            # Test connection
-            self.client.admin.command('ping')
+            # Reuse the shared, pooled MongoDB client
+            self.client = _get_client()
             
             # Get database and collection
-            self.db = self.client[self.config.MONGO_DB_NAME]
-            self.collection = self.db[self.config.MONGO_COLLECTION_NAME]
+            self.db = self.client[Config.MONGO_DB_NAME]
+            self.collection = self.db[Config.MONGO_COLLECTION_NAME]
+            
+            # Detection logging is fire-and-forget, so inserts can skip the
+            # server acknowledgement; admin operations keep using self.collection
+            if Config.UNACK_WRITES:
+                self.write_collection = self.collection.with_options(
+                    write_concern=WriteConcern(w=0)
+                )
+            else:
+                self.write_collection = self.collection
             
             # Create indexes for better query performance
             self._create_indexes()
@@ -40,21 +74,46 @@ class MongoDB:
     def _create_indexes(self):
         """Create indexes for optimized queries"""
         try:
-            # Index on timestamp for time-based queries
-            self.collection.create_index([("timestamp", -1)])
+            existing = self.collection.index_information()
+            obsolete = list(OBSOLETE_INDEXES)
             
-            # Index on video source
-            self.collection.create_index([("video_source", 1)])
+            if Config.RETENTION_DAYS > 0:
+                # TTL index on timestamp: the server expires old detections in the
+                # background, and the same index serves time-based queries/sorts
+                expire_seconds = Config.RETENTION_DAYS * 86400
+                ttl_index = existing.get(TTL_INDEX_NAME)
+                if ttl_index is None:
+                    self.collection.create_index(
+                        [("timestamp", 1)],
+                        expireAfterSeconds=expire_seconds,
+                        name=TTL_INDEX_NAME
+                    )
+                elif ttl_index.get('expireAfterSeconds') != expire_seconds:
+                    # Retention set through cleanup_old_data takes priority
+                    print(f"Note: keeping existing retention of "
+                          f"{ttl_index.get('expireAfterSeconds', 0) / 86400:g} days "
+                          f"(RETENTION_DAYS={Config.RETENTION_DAYS}); use cleanup to change it")
+                obsolete.append("timestamp_-1")
+            else:
+                # Index on timestamp for time-based queries
+                self.collection.create_index([("timestamp", -1)])
+                if TTL_INDEX_NAME in existing:
+                    print(f"Note: existing TTL index '{TTL_INDEX_NAME}' still expires old detections")
             
-            # Index on frame number
-            self.collection.create_index([("frame_number", 1)])
-            
-            # Compound index for common queries
+            # Compound index for common queries. Its video_source prefix also
+            # serves video_source-only filters (ESR rule), so no standalone
+            # video_source index is kept; nothing filters on frame_number either.
+            # Each extra index is another B-tree update on every insert.
             self.collection.create_index([
                 ("video_source", 1),
                 ("timestamp", -1)
             ])
             
+            # Drop indexes that older versions created but are now redundant
+            for name in obsolete:
+                if name in existing:
+                    self.collection.drop_index(name)
+            
         except Exception as e:
             print(f"Warning: Could not create indexes: {e}")
     
@@ -69,7 +128,7 @@ class MongoDB:
             ObjectId: Inserted document ID
         """
         try:
-            result = self.collection.insert_one(document)
+            result = self.write_collection.insert_one(document)
             return result.inserted_id
         except Exception as e:
             raise Exception(f"Failed to insert document: {e}")
@@ -85,30 +144,71 @@ class MongoDB:
             list: List of inserted document IDs
         """
         try:
-            result = self.collection.insert_many(documents)
+            result = self.write_collection.insert_many(documents)
             return result.inserted_ids
         except Exception as e:
             raise Exception(f"Failed to insert documents: {e}")
     
-    def get_detections_by_source(self, video_source, limit=100):
+    def insert_many_detections_unordered(self, documents):
         """
-        Get detections for a specific video source
+        Insert multiple detection documents without enforcing order
+        
+        Unordered inserts let the server keep going past a failed document
+        and apply the batch in a single round-trip.
         
         Args:
-            video_source (str): Video source identifier
-            limit (int): Maximum number of documents to return
+            documents (list): List of detection documents
         
         Returns:
-            list: List of detection documents
+            list: List of inserted document IDs
         """
         try:
-            return list(self.collection.find(
-                {"video_source": video_source}
-            ).sort("timestamp", -1).limit(limit))
+            result = self.write_collection.insert_many(documents, ordered=False)
+            return result.inserted_ids
+        except Exception as e:
+            raise Exception(f"Failed to insert documents: {e}")
+    
+    @staticmethod
+    def _stream_detections(cursor):
+        """Yield documents from a cursor, wrapping errors raised while iterating it"""
+        try:
+            yield from cursor
         except Exception as e:
             raise Exception(f"Failed to query detections: {e}")
     
-    def get_detections_by_time_range(self, start_time, end_time, video_source=None):
+    @staticmethod
+    def _time_range_query(start_time, end_time, video_source=None):
+        """Build the filter for detections within a time range"""
+        query = {
+            "timestamp": {
+                "$gte": start_time,
+                "$lte": end_time
+            }
+        }
+        
+        if video_source:
+            query["video_source"] = video_source
+        
+        return query
+    
+    def get_detections_by_source(self, video_source, limit=100, projection=DEFAULT_PROJECTION):
+        """
+        Get detections for a specific video source
+        
+        Args:
+            video_source (str): Video source identifier
+            limit (int): Maximum number of documents to return
+            projection (dict): Fields to return; excludes the per-box
+                detections array by default (pass None for full documents)
+        
+        Returns:
+            generator: Detection documents, streamed from the cursor
+        """
+        return self._stream_detections(self.collection.find(
+            {"video_source": video_source}, projection
+        ).sort("timestamp", -1).limit(limit))
+    
+    def get_detections_by_time_range(self, start_time, end_time, video_source=None, projection=None):
         """
         Get detections within a time range
         
@@ -116,24 +216,51 @@ class MongoDB:
             start_time (datetime): Start time
             end_time (datetime): End time
             video_source (str): Optional video source filter
+            projection (dict): Optional fields to return (None = full documents)
         
         Returns:
-            list: List of detection documents
+            generator: Detection documents, streamed from the cursor
+        """
+        query = self._time_range_query(start_time, end_time, video_source)
+        return self._stream_detections(
+            self.collection.find(query, projection).sort("timestamp", -1)
+        )
+    
+    def get_time_range_object_totals(self, start_time, end_time, video_source=None):
+        """
+        Count detections and sum their object counts within a time range
+        
+        Args:
+            start_time (datetime): Start time
+            end_time (datetime): End time
+            video_source (str): Optional video source filter
+        
+        Returns:
+            dict: 'total_documents' (int) and 'object_totals', a list of
+                {'_id': class_name, 'total': count} sorted by total
         """
         try:
-            query = {
-                "timestamp": {
-                    "$gte": start_time,
-                    "$lte": end_time
-                }
-            }
-            
-            if video_source:
-                query["video_source"] = video_source
+            pipeline = [
+                {"$match": self._time_range_query(start_time, end_time, video_source)},
+                {"$facet": {
+                    "documents": [{"$count": "count"}],
+                    "object_totals": [
+                        {"$project": {"kv": {"$objectToArray": "$object_counts"}}},
+                        {"$unwind": "$kv"},
+                        {"$group": {"_id": "$kv.k", "total": {"$sum": "$kv.v"}}},
+                        {"$sort": {"total": -1}}
+                    ]
+                }}
+            ]
             
-            return list(self.collection.find(query).sort("timestamp", -1))
+            result = next(self.collection.aggregate(pipeline))
+            documents = result["documents"]
+            return {
+                'total_documents': documents[0]["count"] if documents else 0,
+                'object_totals': result["object_totals"]
+            }
         except Exception as e:
-            raise Exception(f"Failed to query detections: {e}")
+            raise Exception(f"Failed to get time range totals: {e}")
     
     def get_object_statistics(self, video_source=None):
         """
@@ -175,15 +302,27 @@ class MongoDB:
         """
         Delete detections older than specified days
         
+        With a TTL index (RETENTION_DAYS > 0) this updates its expiry so the
+        server removes old documents in the background; otherwise the
+        documents are deleted directly.
+        
         Args:
             days (int): Number of days to keep
         
         Returns:
-            int: Number of deleted documents
+            int: Number of deleted documents, or None when the TTL index
+                removes them in the background
         """
         try:
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
+            if TTL_INDEX_NAME in self.collection.index_information():
+                self.db.command(
+                    "collMod",
+                    Config.MONGO_COLLECTION_NAME,
+                    index={"name": TTL_INDEX_NAME, "expireAfterSeconds": days * 86400}
+                )
+                return None
+            
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
             
             result = self.collection.delete_many({
                 "timestamp": {"$lt": cutoff_date}
@@ -202,19 +341,37 @@ class MongoDB:
         """
         try:
             stats = {
-                'total_documents': self.collection.count_documents({}),
-                'database_name': self.config.MONGO_DB_NAME,
-                'collection_name': self.config.MONGO_COLLECTION_NAME,
+                # Read from collection metadata instead of scanning
+                'total_documents': self.collection.estimated_document_count(),
+                'database_name': Config.MONGO_DB_NAME,
+                'collection_name': Config.MONGO_COLLECTION_NAME,
                 'indexes': self.collection.index_information()
             }
             return stats
         except Exception as e:
             raise Exception(f"Failed to get collection stats: {e}")
     
+    def get_exact_count(self, query=None):
+        """
+        Count documents exactly (scans the matching index or collection)
+        
+        Args:
+            query (dict): Optional filter
+        
+        Returns:
+            int: Number of matching documents
+        """
+        try:
+            return self.collection.count_documents(query or {})
+        except Exception as e:
+            raise Exception(f"Failed to count documents: {e}")
+    
     def close(self):
-        """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
+        """Release this handler; the shared client pool stays open for reuse"""
+        self.client = None
+        self.db = None
+        self.collection = None
+        self.write_collection = None
     
     def __enter__(self):
         """Context manager entry"""
@@ -1,33 +1,84 @@
-import cv2
-from ultralytics import YOLO
+import os
 import time
+import queue
+import threading
+import numpy as np
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 from config import Config
-from database import MongoDB
 
 class ObjectDetector:
     def __init__(self):
-        self.config = Config()
-        print(f"Loading YOLO model: {self.config.MODEL_NAME}")
-        self.model = YOLO(self.config.MODEL_NAME)
+        self.model = self._load_model()
+        
+        # Resolve target class names to model class IDs once (None = all classes)
+        name_to_id = {name: cls_id for cls_id, name in self.model.names.items()}
+        self._allowed_ids = frozenset(
+            name_to_id[name] for name in Config.TARGET_CLASSES if name in name_to_id
+        ) if Config.TARGET_CLASSES else None
         self.class_counts = defaultdict(int)
         self.frame_count = 0
         self.processed_frames = 0
+        self._last_display_t = 0.0
         
         # Initialize MongoDB connection
         self.db = None
-        if self.config.ENABLE_MONGODB:
+        self._mongo_batch_size = max(1, Config.MONGO_BATCH_SIZE)
+        self._write_q = queue.Queue(maxsize=Config.MONGO_QUEUE_SIZE)
+        self._writer = None
+        self.dropped_documents = 0
+        if Config.ENABLE_MONGODB:
             try:
+                from database import MongoDB
                 self.db = MongoDB()
-                print(f"✓ Connected to MongoDB: {self.config.MONGO_DB_NAME}.{self.config.MONGO_COLLECTION_NAME}")
+                print(f"✓ Connected to MongoDB: {Config.MONGO_DB_NAME}.{Config.MONGO_COLLECTION_NAME}")
             except Exception as e:
                 print(f"✗ MongoDB connection failed: {e}")
                 print("  Continuing without database logging...")
         
+    def _load_model(self):
+        """Load the YOLO model, using a TensorRT engine for fp16/int8 on CUDA"""
+        # Heavy dependencies are imported on first use to keep startup fast
+        from ultralytics import YOLO
+        
+        model_name = Config.MODEL_NAME
+        precision = Config.MODEL_PRECISION
+        if precision not in ('fp32', 'fp16', 'int8'):
+            raise ValueError(f"Unsupported MODEL_PRECISION: {precision}")
+        
+        if precision != 'fp32' and model_name.endswith('.pt'):
+            import torch
+            
+            if torch.cuda.is_available():
+                # The engine's dynamic batch limit is fixed at export, so key the cache on it
+                batch_size = max(1, Config.BATCH_SIZE)
+                engine_path = f"{os.path.splitext(model_name)[0]}_{precision}_b{batch_size}.engine"
+                if not os.path.exists(engine_path):
+                    print(f"Exporting {model_name} to TensorRT ({precision}): {engine_path}")
+                    export_args = {
+                        'format': 'engine',
+                        'half': precision == 'fp16',
+                        'int8': precision == 'int8',
+                        'dynamic': True,
+                        'batch': batch_size,
+                        'device': 0
+                    }
+                    if precision == 'int8':
+                        export_args['data'] = Config.INT8_CALIBRATION_DATA
+                    exported = YOLO(model_name).export(**export_args)
+                    os.replace(exported, engine_path)
+                model_name = engine_path
+            else:
+                print(f"CUDA not available, ignoring MODEL_PRECISION={precision}")
+        
+        print(f"Loading YOLO model: {model_name}")
+        return YOLO(model_name)
+    
     def process_video(self, source):
         """Process video from file or stream URL"""
-        cap = cv2.VideoCapture(source)
+        import cv2
+        
+        cap = self._open_capture(source)
         
         if not cap.isOpened():
             print(f"Error: Cannot open video source: {source}")
@@ -41,90 +92,54 @@ class ObjectDetector:
         print(f"FPS: {fps:.2f}")
         if total_frames > 0:
             print(f"Total Frames: {total_frames}")
-        print(f"Frame Skip: {self.config.FRAME_SKIP}")
-        print(f"Confidence Threshold: {self.config.CONFIDENCE_THRESHOLD}")
+        print(f"Frame Skip: {Config.FRAME_SKIP}")
+        print(f"Batch Size: {Config.BATCH_SIZE}")
+        print(f"Confidence Threshold: {Config.CONFIDENCE_THRESHOLD}")
         print(f"{'='*60}\n")
         
+        # Persist detections on a background thread so inference never waits on MongoDB
+        if self.db and not self._writer:
+            self.dropped_documents = 0
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+        
         start_time = time.time()
+        batch_size = max(1, Config.BATCH_SIZE)
+        batch_frames = []
+        batch_numbers = []
         
         try:
             while cap.isOpened():
+                # Skip frames based on config; grab() advances without decoding
+                ret = True
+                for _ in range(Config.FRAME_SKIP - 1):
+                    ret = cap.grab()
+                    if not ret:
+                        break
+                    self.frame_count += 1
+                if not ret:
+                    break
+                
                 ret, frame = cap.read()
                 if not ret:
                     break
                 
                 self.frame_count += 1
                 
-                # Skip frames based on config
-                if self.frame_count % self.config.FRAME_SKIP != 0:
+                # Collect frames so YOLO runs one forward pass per batch
+                batch_frames.append(frame)
+                batch_numbers.append(self.frame_count)
+                if len(batch_frames) < batch_size:
                     continue
                 
-                self.processed_frames += 1
-                
-                # Run YOLO detection
-                results = self.model(frame, conf=self.config.CONFIDENCE_THRESHOLD, verbose=False)
-                
-                # Reset counts for this frame
-                frame_counts = defaultdict(int)
-                
-                # Process detections
-                detections_list = []
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        cls_id = int(box.cls[0])
-                        class_name = self.model.names[cls_id]
-                        confidence = float(box.conf[0])
-                        
-                        # Filter by target classes if specified
-                        if self.config.TARGET_CLASSES and class_name not in self.config.TARGET_CLASSES:
-                            continue
-                        
-                        frame_counts[class_name] += 1
-                        
-                        # Collect detection data for MongoDB
-                        x1, y1, x2, y2 = map(float, box.xyxy[0])
-                        detection_data = {
-                            'class_name': class_name,
-                            'confidence': round(confidence, 4),
-                            'bounding_box': {
-                                'x1': round(x1, 2),
-                                'y1': round(y1, 2),
-                                'x2': round(x2, 2),
-                                'y2': round(y2, 2)
-                            }
-                        }
-                        detections_list.append(detection_data)
-                        
-                        # Draw bounding box if display is enabled
-                        if self.config.DISPLAY_VIDEO:
-                            x1_int, y1_int, x2_int, y2_int = map(int, [x1, y1, x2, y2])
-                            cv2.rectangle(frame, (x1_int, y1_int), (x2_int, y2_int), (0, 255, 0), 2)
-                            label = f"{class_name}: {confidence:.2f}"
-                            cv2.putText(frame, label, (x1_int, y1_int-10), 
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                
-                # Update total counts
-                for cls_name, count in frame_counts.items():
-                    self.class_counts[cls_name] = max(self.class_counts[cls_name], count)
-                
-                # Save to MongoDB if enabled and detections exist
-                if self.db and detections_list:
-                    self._save_to_mongodb(detections_list, frame_counts, source)
-                
-                # Display counts in terminal
-                self._display_counts(frame_counts)
-                
-                # Display video window if enabled
-                if self.config.DISPLAY_VIDEO:
-                    # Add frame info overlay
-                    cv2.putText(frame, f"Frame: {self.frame_count}", (10, 30),
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.imshow('YOLOv8 Detection', frame)
-                    
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        print("\nStopping detection (user interrupted)")
-                        break
+                keep_running = self._process_batch(batch_frames, batch_numbers, source)
+                batch_frames, batch_numbers = [], []
+                if not keep_running:
+                    break
+            
+            # Process the final partial batch
+            if batch_frames:
+                self._process_batch(batch_frames, batch_numbers, source)
                 
         except KeyboardInterrupt:
             print("\n\nDetection interrupted by user")
@@ -132,40 +147,201 @@ class ObjectDetector:
             cap.release()
             cv2.destroyAllWindows()
             
+            # Write any buffered detections
+            self.flush()
+            
             # Display summary
             self._display_summary(start_time)
     
-    def _save_to_mongodb(self, detections_list, frame_counts, source):
+    def _open_capture(self, source):
+        """Open a video source, preferring FFmpeg with hardware-accelerated decoding"""
+        import cv2
+        
+        # Webcam indices are not FFmpeg inputs (env values arrive as strings)
+        if isinstance(source, int) or str(source).isdigit():
+            return cv2.VideoCapture(int(source))
+        
+        # Hardware decode must be requested when opening (OpenCV >= 4.5)
+        cap = None
+        if hasattr(cv2, 'VIDEO_ACCELERATION_ANY'):
+            cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [
+                cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+                cv2.CAP_PROP_HW_ACCELERATION_USE_OPENCL, 1
+            ])
+        if cap is None or not cap.isOpened():
+            cap = cv2.VideoCapture(source)
+        
+        # Keep live streams from accumulating stale frames
+        if str(source).lower().startswith(('rtsp://', 'http://', 'https://')):
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        return cap
+    
+    def _process_batch(self, frames, frame_numbers, source):
+        """
+        Run YOLO on a batch of frames and handle each frame's detections
+        
+        Returns:
+            bool: False if the user asked to stop, True otherwise
+        """
+        import cv2
+        
+        # Run YOLO detection on the whole batch
+        results = self.model(frames, conf=Config.CONFIDENCE_THRESHOLD, verbose=False)
+        
+        for frame, frame_number, result in zip(frames, frame_numbers, results):
+            self.processed_frames += 1
+            
+            # Copy each box tensor to the CPU once instead of per box
+            boxes = result.boxes
+            cls_ids = boxes.cls.cpu().numpy().astype(np.int32)
+            # Widen to float64 so rounded values are stored as clean doubles
+            confidences = boxes.conf.cpu().numpy().astype(np.float64)
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.float64)
+            
+            # Filter by target classes if specified
+            if self._allowed_ids is not None:
+                mask = np.isin(cls_ids, list(self._allowed_ids))
+                cls_ids, confidences, xyxy = cls_ids[mask], confidences[mask], xyxy[mask]
+            
+            class_names = [self.model.names[c] for c in cls_ids.tolist()]
+            unique_ids, counts = np.unique(cls_ids, return_counts=True)
+            frame_counts = {self.model.names[c]: n for c, n in zip(unique_ids.tolist(), counts.tolist())}
+            
+            # Collect detection data for MongoDB
+            detections_list = [
+                {
+                    'class_name': class_name,
+                    'confidence': confidence,
+                    'bounding_box': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+                }
+                for class_name, confidence, (x1, y1, x2, y2) in zip(
+                    class_names, confidences.round(4).tolist(), xyxy.round(2).tolist()
+                )
+            ]
+            
+            # Draw bounding boxes if display is enabled
+            if Config.DISPLAY_VIDEO and len(class_names):
+                self._draw_detections(frame, class_names, confidences, xyxy)
+            
+            # Update total counts
+            for cls_name, count in frame_counts.items():
+                self.class_counts[cls_name] = max(self.class_counts[cls_name], count)
+            
+            # Save to MongoDB if enabled and detections exist
+            if self.db and detections_list:
+                self._save_to_mongodb(detections_list, frame_counts, source, frame_number)
+            
+            # Display counts in terminal
+            self._display_counts(frame_counts, frame_number)
+            
+            # Display video window if enabled
+            if Config.DISPLAY_VIDEO:
+                # Add frame info overlay
+                cv2.putText(frame, f"Frame: {frame_number}", (10, 30),
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                cv2.imshow('YOLOv8 Detection', frame)
+                
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    print("\nStopping detection (user interrupted)")
+                    return False
+        
+        return True
+    
+    def _draw_detections(self, frame, class_names, confidences, xyxy):
+        """Draw all bounding boxes in one polylines call, then their labels"""
+        import cv2
+        
+        boxes = xyxy.astype(np.int32)
+        x1, y1, x2, y2 = boxes.T
+        corners = np.stack([
+            np.stack([x1, y1], axis=1), np.stack([x2, y1], axis=1),
+            np.stack([x2, y2], axis=1), np.stack([x1, y2], axis=1)
+        ], axis=1)
+        cv2.polylines(frame, list(corners), True, (0, 255, 0), 2, cv2.LINE_8)
+        
+        labels = [f"{name}: {conf:.2f}" for name, conf in zip(class_names, confidences.tolist())]
+        for label, x, y in zip(labels, x1.tolist(), y1.tolist()):
+            cv2.putText(frame, label, (x, y-10),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_8)
+    
+    def _save_to_mongodb(self, detections_list, frame_counts, source, frame_number):
         """Save detection data to MongoDB"""
         try:
             document = {
-                'timestamp': datetime.utcnow(),
+                'timestamp': None,  # Stamped once per batch by the writer thread
                 'video_source': source,
-                'frame_number': self.frame_count,
+                'frame_number': frame_number,
                 'processed_frame_number': self.processed_frames,
                 'total_objects_detected': len(detections_list),
                 'object_counts': dict(frame_counts),
                 'detections': detections_list,
                 'model_info': {
-                    'model_name': self.config.MODEL_NAME,
-                    'confidence_threshold': self.config.CONFIDENCE_THRESHOLD
+                    'model_name': Config.MODEL_NAME,
+                    'confidence_threshold': Config.CONFIDENCE_THRESHOLD
                 }
             }
             
-            self.db.insert_detection(document)
+            self._write_q.put_nowait(document)
             
+        except queue.Full:
+            self.dropped_documents += 1
         except Exception as e:
-            print(f"\n✗ MongoDB insert error: {e}")
+            print(f"\n✗ MongoDB queue error: {e}")
     
-    def _display_counts(self, frame_counts):
-        """Display object counts in terminal"""
-        print(f"\rFrame {self.frame_count} (Processed: {self.processed_frames}) | ", end="")
+    def _writer_loop(self):
+        """Drain queued documents and insert them in batches"""
+        running = True
+        while running:
+            document = self._write_q.get()
+            if document is None:
+                break
+            
+            batch = [document]
+            while len(batch) < self._mongo_batch_size:
+                try:
+                    document = self._write_q.get(timeout=0.05)
+                except queue.Empty:
+                    break
+                if document is None:
+                    running = False
+                    break
+                batch.append(document)
+            
+            # One timestamp per batch; frame_number keeps per-frame ordering
+            timestamp = datetime.now(timezone.utc)
+            for document in batch:
+                document['timestamp'] = timestamp
+            
+            try:
+                self.db.insert_many_detections_unordered(batch)
+            except Exception as e:
+                print(f"\n✗ MongoDB insert error: {e}")
+    
+    def flush(self):
+        """Stop the background writer after it has written all queued documents"""
+        if not self._writer:
+            return
+        
+        self._write_q.put(None)
+        self._writer.join()
+        self._writer = None
+        
+        if self.dropped_documents:
+            print(f"\n✗ MongoDB write queue full: dropped {self.dropped_documents} documents")
+    
+    def _display_counts(self, frame_counts, frame_number):
+        """Display object counts in terminal (throttled to DISPLAY_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._last_display_t < Config.DISPLAY_INTERVAL:
+            return
+        self._last_display_t = now
         
         if frame_counts:
-            count_str = " | ".join([f"{cls}: {count}" for cls, count in sorted(frame_counts.items())])
-            print(count_str, end="", flush=True)
+            count_str = " | ".join(f"{cls}: {count}" for cls, count in sorted(frame_counts.items()))
         else:
-            print("No objects detected", end="", flush=True)
+            count_str = "No objects detected"
+        print(f"\rFrame {frame_number} (Processed: {self.processed_frames}) | {count_str}", end="", flush=True)
     
     def _display_summary(self, start_time):
         """Display detection summary"""
@@ -191,7 +367,6 @@ class ObjectDetector:
 
 
 def main():
-    config = Config()
     detector = ObjectDetector()
     
     print("\n" + "="*60)
@@ -199,7 +374,7 @@ def main():
     print("="*60)
     
     # Process video source
-    detector.process_video(config.VIDEO_SOURCE)
+    detector.process_video(Config.VIDEO_SOURCE)
 
 
 if __name__ == "__main__":
@@ -1,35 +1,52 @@
-from database import MongoDB
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import itertools
 import json
 
+# Documents fetched per cursor round-trip
+CURSOR_BATCH_SIZE = 500
+
 def print_separator(char="=", length=60):
     print(char * length)
 
+def _json_default(value):
+    """Serialize ObjectId and datetime values for JSON export"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
 def display_recent_detections(limit=10):
     """Display recent detection records"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print(f"RECENT DETECTIONS (Last {limit})")
         print_separator()
         
-        detections = list(db.collection.find().sort("timestamp", -1).limit(limit))
+        # Stream results from the cursor instead of loading them all first
+        detections = db.collection.find(
+            projection={"detections": 0}
+        ).sort("timestamp", -1).limit(limit).batch_size(CURSOR_BATCH_SIZE)
         
-        if not detections:
-            print("No detections found in database.")
-            return
-        
-        for i, det in enumerate(detections, 1):
-            print(f"\n[{i}] Detection ID: {det['_id']}")
+        count = 0
+        for count, det in enumerate(detections, 1):
+            print(f"\n[{count}] Detection ID: {det['_id']}")
             print(f"    Timestamp: {det['timestamp']}")
             print(f"    Video Source: {det['video_source']}")
             print(f"    Frame: {det['frame_number']} (Processed: {det['processed_frame_number']})")
             print(f"    Total Objects: {det['total_objects_detected']}")
             print(f"    Object Counts: {det['object_counts']}")
         
+        if not count:
+            print("No detections found in database.")
+            return
+        
         print_separator()
 
 def display_object_statistics(video_source=None):
     """Display aggregated object statistics"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print("OBJECT DETECTION STATISTICS")
@@ -57,6 +74,8 @@ def display_object_statistics(video_source=None):
 
 def display_collection_info():
     """Display collection information"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print("COLLECTION INFORMATION")
@@ -75,67 +94,74 @@ def display_collection_info():
 
 def display_detections_by_time_range(hours=1):
     """Display detections from last N hours"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print(f"DETECTIONS FROM LAST {hours} HOUR(S)")
         print_separator()
         
-        end_time = datetime.utcnow()
+        end_time = datetime.now(timezone.utc)
         start_time = end_time - timedelta(hours=hours)
         
-        detections = db.get_detections_by_time_range(start_time, end_time)
+        # Count and sum server-side in one aggregation; only the totals come back
+        totals = db.get_time_range_object_totals(start_time, end_time)
         
-        if not detections:
+        if not totals['total_documents']:
             print(f"No detections found in the last {hours} hour(s).")
             return
         
-        print(f"\nTotal Detections: {len(detections)}")
-        
-        # Aggregate counts
-        total_objects = {}
-        for det in detections:
-            for cls_name, count in det['object_counts'].items():
-                total_objects[cls_name] = total_objects.get(cls_name, 0) + count
+        print(f"\nTotal Detections: {totals['total_documents']}")
         
         print(f"\nAggregated Object Counts:")
-        for cls_name, count in sorted(total_objects.items(), key=lambda x: x[1], reverse=True):
-            print(f"  {cls_name}: {count}")
+        for total in totals['object_totals']:
+            print(f"  {total['_id']}: {total['total']}")
         
         print_separator()
 
 def export_to_json(output_file='detections_export.json', limit=100):
     """Export detections to JSON file"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print(f"EXPORTING DETECTIONS TO JSON")
         print_separator()
         
-        detections = list(db.collection.find().sort("timestamp", -1).limit(limit))
+        detections = db.collection.find().sort("timestamp", -1).limit(limit).batch_size(CURSOR_BATCH_SIZE)
         
-        if not detections:
+        first = next(detections, None)
+        if first is None:
             print("No detections to export.")
             return
         
-        # Convert ObjectId to string for JSON serialization
-        for det in detections:
-            det['_id'] = str(det['_id'])
-            det['timestamp'] = det['timestamp'].isoformat()
-        
+        # Write documents one at a time so memory use stays constant
+        count = 0
         with open(output_file, 'w') as f:
-            json.dump(detections, f, indent=2)
+            f.write("[\n")
+            for count, det in enumerate(itertools.chain([first], detections), 1):
+                if count > 1:
+                    f.write(",\n")
+                f.write(json.dumps(det, indent=2, default=_json_default))
+            f.write("\n]\n")
         
-        print(f"✓ Exported {len(detections)} detections to {output_file}")
+        print(f"✓ Exported {count} detections to {output_file}")
         print_separator()
 
 def cleanup_old_data(days=7):
     """Delete old detection records"""
+    from database import MongoDB
+    
     with MongoDB() as db:
         print_separator()
         print(f"CLEANING UP DATA OLDER THAN {days} DAYS")
         print_separator()
         
         deleted_count = db.delete_old_detections(days)
-        print(f"✓ Deleted {deleted_count} old detection records")
+        if deleted_count is None:
+            print(f"✓ Retention set to {days} days; older records are removed in the background")
+        else:
+            print(f"✓ Deleted {deleted_count} old detection records")
         print_separator()
 
 def main():